@@ -7,6 +7,8 @@ PUBLIC/SAFE VERSION NOTES:
 - No internal paths, no company names, no real data.
 - Excel path is provided via --excel or env var SAP_AUTOMATION_EXCEL.
 - Column names are in English for portfolio consistency.
+- BASE_UOM is optional: it is resolved per material from a master-data export
+  (--master-export) or a cached MM03 read (see master_data_lookup.py).
 """
 
 import os
@@ -15,6 +17,15 @@ import argparse
 import pandas as pd
 import win32com.client
 
+from master_data_lookup import (
+    DEFAULT_CACHE_PATH,
+    DEFAULT_CACHE_TTL_HOURS,
+    KEY_BASE_UOM,
+    MasterDataLookup,
+    load_master_export,
+    normalize_material,
+)
+
 
 # ----------------------------
 # SAFE DEFAULT CONFIG
@@ -109,7 +120,6 @@ def load_excel(path: str, sheet=DEFAULT_SHEET_NAME) -> pd.DataFrame:
         normalize_col(COL_MATERIAL),
         normalize_col(COL_FAMILY),
         normalize_col(COL_BATCH),
-        normalize_col(COL_BASE_UOM),
         normalize_col(COL_WEIGHT),
     }
 
@@ -117,7 +127,11 @@ def load_excel(path: str, sheet=DEFAULT_SHEET_NAME) -> pd.DataFrame:
     if missing:
         raise ValueError(f"Missing required columns: {sorted(missing)}. Found: {list(df.columns)}")
 
-    for c in required:
+    # BASE_UOM is optional; it is resolved from master data when absent
+    if normalize_col(COL_BASE_UOM) not in df.columns:
+        df[normalize_col(COL_BASE_UOM)] = ""
+
+    for c in required | {normalize_col(COL_BASE_UOM)}:
         df[c] = df[c].fillna("").astype(str).str.strip()
 
     df = df[
@@ -130,6 +144,39 @@ def load_excel(path: str, sheet=DEFAULT_SHEET_NAME) -> pd.DataFrame:
     return df
 
 
+def resolve_base_uom(df: pd.DataFrame, lookup: MasterDataLookup) -> pd.DataFrame:
+    """
+    Fills BASE_UOM from master data, one lookup per unique material.
+
+    Master data wins over the Excel value; the Excel value is only kept for
+    materials the lookup could not resolve. Mismatches are reported. Rows
+    left without BASE_UOM are skipped by main().
+    """
+    col_mat = normalize_col(COL_MATERIAL)
+    col_uom = normalize_col(COL_BASE_UOM)
+
+    records = lookup.resolve_many(df[col_mat])
+    uom_by_material = {m: r[KEY_BASE_UOM] for m, r in records.items() if r[KEY_BASE_UOM]}
+
+    resolved = df[col_mat].map(normalize_material).map(uom_by_material).fillna("")
+    given = df[col_uom].str.upper()
+
+    mismatch = (resolved != "") & (given != "") & (resolved != given)
+    conflicts = pd.DataFrame(
+        {"material": df[col_mat], "excel": given, "master": resolved}
+    )[mismatch].drop_duplicates("material")
+    for c in conflicts.itertuples(index=False):
+        print(f"WARN: MAT={c.material} BASE_UOM Excel={c.excel} != master data={c.master}; using master data")
+
+    df[col_uom] = resolved.where(resolved != "", df[col_uom])
+
+    unresolved = df.loc[df[col_uom] == "", col_mat].unique()
+    if len(unresolved):
+        print(f"WARN: BASE_UOM unresolved for {len(unresolved)} material(s); their rows will be skipped")
+
+    return df
+
+
 def normalize_weight(value: str) -> str:
     # Ensure decimal point format for SAP input
     return str(value).replace(",", ".").strip()
@@ -216,6 +263,19 @@ def parse_args():
     p.add_argument("--connection", type=int, default=DEFAULT_CONNECTION_INDEX, help="SAP connection index.")
     p.add_argument("--session", type=int, default=DEFAULT_SESSION_INDEX, help="SAP session index.")
     p.add_argument("--delay", type=float, default=DEFAULT_DELAY, help="Delay between actions (seconds).")
+    p.add_argument("--master-export", default="", help="Master-data export (Excel/CSV with MATNR, MEINS, ...).")
+    p.add_argument(
+        "--lookup-cache",
+        default=os.getenv("SAP_AUTOMATION_LOOKUP_CACHE", DEFAULT_CACHE_PATH),
+        help="Persistent lookup cache file (empty string disables it).",
+    )
+    p.add_argument(
+        "--cache-ttl-hours",
+        type=float,
+        default=DEFAULT_CACHE_TTL_HOURS,
+        help="Max age of cached lookups in hours (default: 168).",
+    )
+    p.add_argument("--no-mm03-lookup", action="store_true", help="Do not read missing materials from MM03.")
     return p.parse_args()
 
 
@@ -227,6 +287,18 @@ def main():
     df = load_excel(args.excel, args.sheet)
     session = get_session(args.connection, args.session)
 
+    export = load_master_export(args.master_export) if args.master_export else None
+    lookup = MasterDataLookup(
+        export=export,
+        session=None if args.no_mm03_lookup else session,
+        cache_path=args.lookup_cache,
+        ttl_hours=args.cache_ttl_hours,
+        delay=args.delay,
+    )
+    df = resolve_base_uom(df, lookup)
+    print(f"Master data: {df[normalize_col(COL_MATERIAL)].nunique()} material(s), {lookup.fetches} MM03 read(s)")
+    print(f"Lookup cache: {lookup.cache_path or 'disabled (no SAP system/client scope)'}")
+
     for i, row in df.iterrows():
         material = row[normalize_col(COL_MATERIAL)]
         family = row[normalize_col(COL_FAMILY)]
@@ -235,6 +307,12 @@ def main():
         weight = normalize_weight(row[normalize_col(COL_WEIGHT)])
 
         row_number_in_excel = i + 2
+
+        # Without BASE_UOM the MLN branch cannot be decided; never guess
+        if not base_uom:
+            print(f"ERROR row {row_number_in_excel}: MAT={material} BATCH={batch} | BASE_UOM unresolved")
+            continue
+
         try:
             status, detail = msc2n_update_batch(
                 session,
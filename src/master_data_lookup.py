@@ -0,0 +1,433 @@
+"""
+SAP Material Master - Reference Data Lookup (Demo)
+--------------------------------------------------
+Resolves per-material reference data (base UoM, material type, plants and
+storage locations) so input files do not have to carry it by hand.
+
+Sources, in order:
+1. A local master-data export (Excel/CSV dumped from MARA/MARD or a report).
+2. A one-time MM03 read per unique material (SAP GUI Scripting).
+
+Results are memoized in an in-memory LRU backed by a persistent JSON cache
+with a TTL, so reruns over the same materials cost zero SAP lookups. The
+cache file is scoped to the SAP system and client (e.g.
+.sap_master_cache.PRD-100.json) so DEV/QA data never feeds a PRD run.
+
+PUBLIC/SAFE VERSION NOTES:
+- No company names, no internal paths, no real data.
+- Cache path is provided via --lookup-cache or env var SAP_AUTOMATION_LOOKUP_CACHE.
+"""
+
+import os
+import json
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+
+# ----------------------------
+# SAFE DEFAULT CONFIG
+# ----------------------------
+DEFAULT_DELAY = 0.2
+DEFAULT_CACHE_PATH = ".sap_master_cache.json"
+DEFAULT_CACHE_TTL_HOURS = 24 * 7
+DEFAULT_LRU_SIZE = 10000
+SAVE_EVERY_FETCHES = 50  # flush cache to disk periodically during long runs
+
+TCODE_MM03 = "/nmm03"
+PANE_W, PANE_H = 88, 30
+
+# Export column naming (SAP technical names, so MARA/MARD dumps work as-is)
+COL_MATERIAL = "MATNR"
+COL_BASE_UOM = "MEINS"
+COL_MATERIAL_TYPE = "MTART"
+COL_PLANT = "WERKS"
+COL_STORAGE = "LGORT"
+
+# Record keys returned by the lookup
+KEY_BASE_UOM = "base_uom"
+KEY_MATERIAL_TYPE = "material_type"
+KEY_PLANTS = "plants"
+KEY_STORAGE_LOCATIONS = "storage_locations"
+
+
+class MaterialNotFoundError(RuntimeError):
+    """MM03 rejected the material number itself (not a GUI/scripting problem)."""
+
+
+def empty_record() -> dict:
+    return {
+        KEY_BASE_UOM: "",
+        KEY_MATERIAL_TYPE: "",
+        KEY_PLANTS: [],
+        KEY_STORAGE_LOCATIONS: [],
+    }
+
+
+def merge_records(primary: dict, fallback: dict) -> dict:
+    """Fills empty fields of `primary` from `fallback`."""
+    return {k: primary.get(k) or fallback.get(k, v) for k, v in empty_record().items()}
+
+
+def normalize_col(col) -> str:
+    return str(col).strip().upper()
+
+
+def normalize_material(value) -> str:
+    """Upper-cases material numbers and drops SAP leading zeros from purely numeric ones."""
+    material = "" if value is None else str(value).strip().upper()
+    if material.isdigit():
+        material = material.lstrip("0") or "0"
+    return material
+
+
+# ----------------------------
+# SAP: LOW-LEVEL HELPERS
+# ----------------------------
+def exists(session, element_id: str) -> bool:
+    try:
+        session.findById(element_id)
+        return True
+    except Exception:
+        return False
+
+
+def send_enter(session, times: int = 1, delay: float = DEFAULT_DELAY):
+    for _ in range(times):
+        session.findById("wnd[0]").sendVKey(0)
+        time.sleep(delay)
+
+
+def set_text(session, element_id: str, value):
+    obj = session.findById(element_id)
+    txt = "" if value is None else str(value).strip()
+    try:
+        obj.text = txt
+    except Exception:
+        obj.Text = txt
+
+
+def go_tcode(session, tcode: str, delay: float = DEFAULT_DELAY):
+    set_text(session, "wnd[0]/tbar[0]/okcd", tcode)
+    send_enter(session, 1, delay=delay)
+
+
+def get_status(session):
+    """Returns (message type, text) of the status bar; ("", "") if unavailable."""
+    try:
+        sbar = session.findById("wnd[0]/sbar")
+        return str(sbar.MessageType).strip().upper(), str(sbar.Text).strip()
+    except Exception:
+        return "", ""
+
+
+def reset_session(session, delay: float = DEFAULT_DELAY):
+    """Closes leftover popups and leaves the current transaction after a failed read."""
+    for _ in range(3):
+        if not exists(session, "wnd[1]"):
+            break
+        try:
+            session.findById("wnd[1]").sendVKey(12)  # F12
+            time.sleep(delay)
+        except Exception:
+            break
+    try:
+        go_tcode(session, "/n", delay=delay)
+    except Exception:
+        pass
+
+
+def session_scope(session) -> str:
+    """Returns "<system>-<client>" for a SAP session, "" if unavailable."""
+    try:
+        system = str(session.Info.SystemName).strip()
+        client = str(session.Info.Client).strip()
+    except Exception:
+        return ""
+    if not system or not client:
+        return ""
+    return f"{system}-{client}"
+
+
+def scoped_cache_path(path: str, scope: str) -> str:
+    """Adds the system/client scope to the cache file name; "" (no cache) if unscoped."""
+    if not path or not scope:
+        return ""
+    safe_scope = "".join(ch if ch.isalnum() or ch in "-_" else "_" for ch in scope.upper())
+    root, ext = os.path.splitext(path)
+    return f"{root}.{safe_scope}{ext or '.json'}"
+
+
+def read_by_name(session, name: str, field_type: str = "GuiCTextField") -> str:
+    """Reads a field by its DDIC name; screen numbers vary by SAP customization."""
+    try:
+        return str(session.findById("wnd[0]/usr").findByName(name, field_type).Text).strip()
+    except Exception:
+        return ""
+
+
+# ----------------------------
+# SOURCE: LOCAL MASTER-DATA EXPORT
+# ----------------------------
+def load_master_export(path: str, sheet=0) -> dict:
+    """
+    Loads a master-data export into {material: record}.
+
+    One row per material/plant/storage location is expected (MARD-like);
+    plants and storage locations are aggregated per material.
+    """
+    if str(path).lower().endswith(".csv"):
+        df = pd.read_csv(path, dtype=str, sep=None, engine="python")
+    else:
+        df = pd.read_excel(path, sheet_name=sheet, dtype=str)
+    df.columns = [normalize_col(c) for c in df.columns]
+
+    if COL_MATERIAL not in df.columns:
+        raise ValueError(f"Master export must contain column {COL_MATERIAL}. Found: {list(df.columns)}")
+
+    for c in (COL_MATERIAL, COL_BASE_UOM, COL_MATERIAL_TYPE, COL_PLANT, COL_STORAGE):
+        if c not in df.columns:
+            df[c] = ""
+        df[c] = df[c].fillna("").astype(str).str.strip()
+
+    df[COL_MATERIAL] = df[COL_MATERIAL].map(normalize_material)
+    df = df[df[COL_MATERIAL] != ""]
+
+    def unique_non_empty(values):
+        return sorted({v for v in values if v})
+
+    def first_non_empty(values):
+        for v in values:
+            if v:
+                return v
+        return ""
+
+    grouped = df.groupby(COL_MATERIAL, sort=False).agg(
+        {
+            COL_BASE_UOM: first_non_empty,
+            COL_MATERIAL_TYPE: first_non_empty,
+            COL_PLANT: unique_non_empty,
+            COL_STORAGE: unique_non_empty,
+        }
+    )
+
+    records = {}
+    for material, row in grouped.iterrows():
+        records[material] = {
+            KEY_BASE_UOM: row[COL_BASE_UOM].upper(),
+            KEY_MATERIAL_TYPE: row[COL_MATERIAL_TYPE].upper(),
+            KEY_PLANTS: row[COL_PLANT],
+            KEY_STORAGE_LOCATIONS: row[COL_STORAGE],
+        }
+    return records
+
+
+# ----------------------------
+# SOURCE: MM03 READ
+# ----------------------------
+def mm03_read_material(session, material: str, delay: float = DEFAULT_DELAY) -> dict:
+    """
+    Reads base UoM and material type from MM03 (Basic Data 1).
+
+    Plants/storage locations are not exposed on a single MM03 screen, so they
+    are only filled from the master-data export.
+    """
+    session.findById("wnd[0]").resizeWorkingPane(PANE_W, PANE_H, False)
+
+    go_tcode(session, TCODE_MM03, delay=delay)
+
+    set_text(session, "wnd[0]/usr/ctxtRMMG1-MATNR", material)
+    send_enter(session, 1, delay=delay)
+
+    # Still on the initial screen with an error message: the material itself is invalid
+    msg_type, msg_text = get_status(session)
+    if msg_type == "E" and not exists(session, "wnd[1]") and exists(session, "wnd[0]/usr/ctxtRMMG1-MATNR"):
+        raise MaterialNotFoundError(f"MM03: {material} not found: {msg_text}")
+
+    # View selection popup: pick the first view (Basic Data 1) and confirm
+    if exists(session, "wnd[1]/usr/tblSAPLMGMMTC_VIEW"):
+        try:
+            session.findById("wnd[1]/usr/tblSAPLMGMMTC_VIEW").getAbsoluteRow(0).selected = True
+        except Exception:
+            pass
+        session.findById("wnd[1]").sendVKey(0)
+        time.sleep(delay)
+
+    record = empty_record()
+    record[KEY_BASE_UOM] = read_by_name(session, "MARA-MEINS").upper()
+    record[KEY_MATERIAL_TYPE] = read_by_name(session, "RMMG1-MTART").upper()
+
+    if not record[KEY_BASE_UOM]:
+        _, detail = get_status(session)
+        raise RuntimeError(f"MM03 read failed for {material}: {detail or 'base UoM not found'}")
+
+    return record
+
+
+# ----------------------------
+# LOOKUP: LRU + PERSISTENT CACHE
+# ----------------------------
+class MasterDataLookup:
+    """
+    Memoized per-material lookup.
+
+    - `export` is a {material: record} dict (see load_master_export).
+    - `session` enables MM03 reads for materials missing from the export
+      or exported without a base UoM (export plants/LGORT are kept).
+    - `scope` ("<system>-<client>") selects the cache file; it is taken from
+      `session` when not given. Without a scope the disk cache is not used.
+    - `fetches` counts MM03 reads actually performed.
+    """
+
+    def __init__(
+        self,
+        export=None,
+        session=None,
+        cache_path: str = DEFAULT_CACHE_PATH,
+        ttl_hours: float = DEFAULT_CACHE_TTL_HOURS,
+        lru_size: int = DEFAULT_LRU_SIZE,
+        delay: float = DEFAULT_DELAY,
+        scope: str = None,
+    ):
+        self.export = export or {}
+        self.session = session
+        self.scope = session_scope(session) if scope is None and session is not None else (scope or "")
+        self.cache_path = scoped_cache_path(cache_path, self.scope)
+        self.ttl_seconds = float(ttl_hours) * 3600
+        self.lru_size = max(1, int(lru_size))
+        self.delay = delay
+
+        self.fetches = 0
+        self._lru = OrderedDict()
+        self._disk = {}
+        self._run_failures = {}
+        self._dirty = False
+        self._load_disk()
+
+    # --- persistent cache ---
+    def _is_fresh(self, entry: dict) -> bool:
+        if self.ttl_seconds <= 0:
+            return False
+        return time.time() - float(entry.get("fetched_at", 0)) < self.ttl_seconds
+
+    def _load_disk(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        self._disk = {k: v for k, v in data.items() if isinstance(v, dict) and self._is_fresh(v)}
+
+    def save(self):
+        if not self.cache_path or not self._dirty:
+            return
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._disk, f, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.cache_path)
+        self._dirty = False
+
+    # --- in-memory LRU ---
+    def _lru_get(self, material: str):
+        if material in self._lru:
+            self._lru.move_to_end(material)
+            return self._lru[material]
+        return None
+
+    def _lru_put(self, material: str, record: dict):
+        self._lru[material] = record
+        self._lru.move_to_end(material)
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    # --- public API ---
+    def get(self, material: str) -> dict:
+        """Returns the record for one material (empty record if unresolved)."""
+        material = normalize_material(material)
+        if not material:
+            return empty_record()
+
+        record = self._lru_get(material)
+        if record is not None:
+            return record
+
+        # The export only short-circuits when it carries the base UoM
+        # (a MARD-only dump has plants/storage locations but no MEINS)
+        export_record = self.export.get(material)
+        if export_record is not None and export_record[KEY_BASE_UOM]:
+            self._lru_put(material, export_record)
+            return export_record
+
+        entry = self._run_failures.get(material) or self._disk.get(material)
+        if entry is None or not self._is_fresh(entry):
+            if self.session is None:
+                return export_record or empty_record()
+            entry = self._fetch(material)
+
+        if "error" in entry:
+            # Known invalid material or failed read in this run; keep any export data
+            if export_record is not None:
+                self._lru_put(material, export_record)
+                return export_record
+            raise RuntimeError(entry["error"])
+
+        record = entry["data"]
+        if export_record is not None:
+            record = merge_records(record, export_record)
+        self._lru_put(material, record)
+        return record
+
+    def _fetch(self, material: str) -> dict:
+        """
+        Reads one material from MM03.
+
+        Successful reads and "material does not exist" results are cached on
+        disk. Other failures (GUI/scripting errors) are only remembered for
+        this run, and the session is reset so the next material starts clean.
+        """
+        self.fetches += 1
+        try:
+            entry = {"data": mm03_read_material(self.session, material, delay=self.delay)}
+            persist = True
+        except MaterialNotFoundError as e:
+            entry = {"error": str(e)}
+            persist = True
+            reset_session(self.session, delay=self.delay)
+        except Exception as e:
+            entry = {"error": str(e)}
+            persist = False
+            reset_session(self.session, delay=self.delay)
+        entry["fetched_at"] = time.time()
+
+        if persist:
+            self._disk[material] = entry
+            self._dirty = True
+            if self.fetches % SAVE_EVERY_FETCHES == 0:
+                self.save()
+        else:
+            self._run_failures[material] = entry
+        return entry
+
+    def resolve_many(self, materials) -> dict:
+        """
+        Resolves each unique material once; returns {material: record}.
+
+        Failed MM03 reads are reported and mapped to an empty record so one
+        bad material does not stop the batch. Only "material does not exist"
+        results are cached; GUI errors are retried on the next run.
+        """
+        unique = list(dict.fromkeys(normalize_material(m) for m in materials))
+        results = {}
+        for material in unique:
+            if not material:
+                continue
+            try:
+                results[material] = self.get(material)
+            except Exception as e:
+                print(f"LOOKUP ERROR: MAT={material} | {e}")
+                results[material] = empty_record()
+        self.save()
+        return results
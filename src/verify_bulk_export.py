@@ -0,0 +1,465 @@
+"""
+SAP Post-Run Verification - Bulk Export Diff (Demo)
+---------------------------------------------------
+Confirms that a run really changed SAP by diffing a bulk export of the
+affected objects against the intended values of the input Excel.
+
+Supported checks (--kind):
+- description : MAKT export (MATNR, MAKTX, optional SPRAS) vs change_description input.
+                MM02 only writes the first two short-text rows, so pass
+                --languages (e.g. E,S) to check just those SPRAS values;
+                without it every exported language must match.
+- storage     : MARD export (MATNR, LGORT, optional WERKS) vs extend_storage_location input.
+- scrap       : batch characteristics export vs batch_scrap_weight_review input.
+                Long format (MATNR, CHARG, ATNAM, ATWRT) or wide format
+                (MATNR, CHARG, <weight char>, <family char>).
+                With --mln-weight-char, the second weight characteristic
+                written for MLN materials is also checked. Missing BASE_UOM
+                values are filled from --master-export / the lookup cache
+                (no SAP reads); rows still without it are counted as not verified.
+                Numbers may carry a trailing unit ("2 KG") and thousands
+                separators; see --decimal-sep. Values that still cannot be
+                parsed are reported as UNPARSEABLE.
+
+Everything is parsed and joined locally with pandas; no SAP GUI navigation.
+Outputs a mismatch report and, optionally, a retry file with the failed
+input rows in the original layout; it is always written as .xlsx so it
+can be passed back as --excel to the update scripts.
+
+PUBLIC/SAFE VERSION NOTES:
+- No company names, no internal paths, no real data.
+- Excel path is provided via --excel or env var SAP_AUTOMATION_EXCEL.
+"""
+
+import os
+import argparse
+import pandas as pd
+
+from master_data_lookup import (
+    DEFAULT_CACHE_PATH,
+    KEY_BASE_UOM,
+    MasterDataLookup,
+    load_master_export,
+    normalize_material,
+)
+
+
+# ----------------------------
+# SAFE DEFAULT CONFIG
+# ----------------------------
+DEFAULT_SHEET_NAME = 0
+DEFAULT_REPORT_PATH = "verification_report.xlsx"
+DEFAULT_WEIGHT_CHAR = "WEIGHT_PER_UNIT"
+DEFAULT_FAMILY_CHAR = "FAMILY"
+DEFAULT_TOLERANCE = 1e-6
+MAKTX_MAX_LEN = 40  # SAP short text length
+
+DECIMAL_AUTO = "auto"  # last of ',' / '.' is the decimal separator
+DECIMAL_SEPARATORS = (DECIMAL_AUTO, ",", ".")
+
+KIND_DESCRIPTION = "description"
+KIND_STORAGE = "storage"
+KIND_SCRAP = "scrap"
+
+# Input columns (same as the update scripts)
+COL_SKU = "SKU"
+COL_DESC = "DESCRIPTION"
+COL_STORAGE_IN = "ALMACEN"
+COL_MATERIAL = "MATERIAL"
+COL_FAMILY = "FAMILY"
+COL_BATCH = "BATCH"
+COL_WEIGHT = "WEIGHT_PER_UNIT"
+COL_BASE_UOM = "BASE_UOM"
+UOM_MLN = "MLN"
+
+# Export columns (SAP technical names)
+EXP_MATNR = "MATNR"
+EXP_MAKTX = "MAKTX"
+EXP_SPRAS = "SPRAS"
+EXP_LGORT = "LGORT"
+EXP_CHARG = "CHARG"
+EXP_ATNAM = "ATNAM"
+EXP_ATWRT = "ATWRT"
+
+# Report columns
+REP_ROW = "EXCEL_ROW"
+REP_KEY = "KEY"
+REP_FIELD = "FIELD"
+REP_EXPECTED = "EXPECTED"
+REP_ACTUAL = "ACTUAL"
+REP_REASON = "REASON"
+
+REASON_MISSING = "NOT_IN_EXPORT"
+REASON_DIFF = "VALUE_MISMATCH"
+REASON_UNPARSEABLE = "UNPARSEABLE"
+
+
+# ----------------------------
+# IO: LOAD + NORMALIZE
+# ----------------------------
+def normalize_col(col) -> str:
+    return str(col).strip().upper()
+
+
+def read_table(path: str, sheet=DEFAULT_SHEET_NAME) -> pd.DataFrame:
+    if str(path).lower().endswith((".csv", ".txt")):
+        df = pd.read_csv(path, dtype=str, sep=None, engine="python")
+    else:
+        df = pd.read_excel(path, sheet_name=sheet, dtype=str)
+    df.columns = [normalize_col(c) for c in df.columns]
+    return df
+
+
+def write_table(df: pd.DataFrame, path: str):
+    if str(path).lower().endswith(".csv"):
+        df.to_csv(path, index=False)
+    else:
+        df.to_excel(path, index=False)
+
+
+def require_columns(df: pd.DataFrame, required, label: str):
+    missing = set(required) - set(df.columns)
+    if missing:
+        raise ValueError(f"{label} is missing columns {sorted(missing)}. Found: {list(df.columns)}")
+
+
+def clean(series: pd.Series) -> pd.Series:
+    return series.fillna("").astype(str).str.strip()
+
+
+def normalize_key(series: pd.Series) -> pd.Series:
+    """Upper-cases keys and drops SAP leading zeros from purely numeric ones."""
+    s = clean(series).str.upper()
+    numeric = s.str.fullmatch(r"\d+")
+    return s.where(~numeric, s.str.lstrip("0").replace("", "0"))
+
+
+def to_number(series: pd.Series, decimal_sep: str = DECIMAL_AUTO) -> pd.Series:
+    """
+    Parses formatted numbers such as "1.234,5", "1,234.5" or "2 KG".
+
+    A trailing unit and blanks are dropped; the other separator is treated
+    as a thousands separator. Unparseable values become NaN.
+    """
+    s = clean(series).str.replace(r"\s*[^\d.,+\-\s]\S*$", "", regex=True).str.replace(r"\s", "", regex=True)
+    if decimal_sep == ",":
+        comma_decimal = pd.Series(True, index=s.index)
+    elif decimal_sep == ".":
+        comma_decimal = pd.Series(False, index=s.index)
+    else:
+        comma_decimal = s.str.rfind(",") > s.str.rfind(".")
+
+    as_comma = s.str.replace(".", "", regex=False).str.replace(",", ".", regex=False)
+    as_dot = s.str.replace(",", "", regex=False)
+    return pd.to_numeric(as_comma.where(comma_decimal, as_dot), errors="coerce")
+
+
+def fill_base_uom(intended: pd.DataFrame, lookup: MasterDataLookup) -> pd.DataFrame:
+    """Fills empty BASE_UOM values from master data (export/cache only)."""
+    if COL_BASE_UOM not in intended.columns:
+        intended[COL_BASE_UOM] = ""
+    intended[COL_BASE_UOM] = clean(intended[COL_BASE_UOM]).str.upper()
+
+    empty = intended[COL_BASE_UOM] == ""
+    if empty.any():
+        records = lookup.resolve_many(intended.loc[empty, COL_MATERIAL])
+        uom_by_material = {m: r[KEY_BASE_UOM] for m, r in records.items()}
+        resolved = intended[COL_MATERIAL].map(normalize_material).map(uom_by_material).fillna("")
+        intended[COL_BASE_UOM] = intended[COL_BASE_UOM].where(~empty, resolved)
+    return intended
+
+
+def load_intended(path: str, sheet, required) -> pd.DataFrame:
+    df = read_table(path, sheet)
+    require_columns(df, required, "Input Excel")
+    for c in required:
+        df[c] = clean(df[c])
+    df[REP_ROW] = df.index + 2  # header at row 1
+    mask = pd.Series(True, index=df.index)
+    for c in required:
+        mask &= df[c] != ""
+    return df[mask].reset_index(drop=True)
+
+
+# ----------------------------
+# CHECKS (vectorized joins)
+# ----------------------------
+def check_description(intended: pd.DataFrame, export: pd.DataFrame, languages=None) -> pd.DataFrame:
+    require_columns(export, {EXP_MATNR, EXP_MAKTX}, "MAKT export")
+    if languages:
+        require_columns(export, {EXP_SPRAS}, "MAKT export (--languages)")
+        export = export[clean(export[EXP_SPRAS]).str.upper().isin([normalize_col(x) for x in languages])]
+
+    left = pd.DataFrame({
+        REP_ROW: intended[REP_ROW],
+        REP_KEY: normalize_key(intended[COL_SKU]),
+        REP_EXPECTED: intended[COL_DESC].str[:MAKTX_MAX_LEN].str.strip(),
+    })
+    right = pd.DataFrame({
+        REP_KEY: normalize_key(export[EXP_MATNR]),
+        REP_ACTUAL: clean(export[EXP_MAKTX]),
+        REP_FIELD: EXP_MAKTX,
+    })
+    if EXP_SPRAS in export.columns:
+        right[REP_FIELD] = EXP_MAKTX + "/" + clean(export[EXP_SPRAS]).str.upper()
+
+    # One row per language: every (selected) language text of a material must match
+    merged = left.merge(right, on=REP_KEY, how="left", indicator=True)
+    merged[REP_REASON] = ""
+    merged.loc[merged["_merge"] == "left_only", REP_REASON] = REASON_MISSING
+    merged.loc[merged["_merge"] == "left_only", REP_FIELD] = EXP_MAKTX
+    differs = (merged["_merge"] == "both") & (merged[REP_ACTUAL] != merged[REP_EXPECTED])
+    merged.loc[differs, REP_REASON] = REASON_DIFF
+    return merged[merged[REP_REASON] != ""]
+
+
+def check_storage(intended: pd.DataFrame, export: pd.DataFrame) -> pd.DataFrame:
+    require_columns(export, {EXP_MATNR, EXP_LGORT}, "MARD export")
+
+    left = pd.DataFrame({
+        REP_ROW: intended[REP_ROW],
+        REP_KEY: normalize_key(intended[COL_SKU]),
+        REP_EXPECTED: clean(intended[COL_STORAGE_IN]).str.upper(),
+    })
+    right = pd.DataFrame({
+        REP_KEY: normalize_key(export[EXP_MATNR]),
+        REP_EXPECTED: clean(export[EXP_LGORT]).str.upper(),
+    }).drop_duplicates()
+
+    merged = left.merge(right, on=[REP_KEY, REP_EXPECTED], how="left", indicator=True)
+    merged = merged[merged["_merge"] == "left_only"].copy()
+    merged[REP_FIELD] = EXP_LGORT
+    merged[REP_ACTUAL] = ""
+    merged[REP_REASON] = REASON_MISSING
+    return merged
+
+
+def pivot_characteristics(export: pd.DataFrame, chars) -> pd.DataFrame:
+    """Returns one row per material/batch with one column per characteristic."""
+    require_columns(export, {EXP_MATNR, EXP_CHARG}, "Batch characteristics export")
+    keys = pd.DataFrame({
+        EXP_MATNR: normalize_key(export[EXP_MATNR]),
+        EXP_CHARG: clean(export[EXP_CHARG]).str.upper(),
+    })
+
+    if EXP_ATNAM in export.columns:
+        require_columns(export, {EXP_ATWRT}, "Batch characteristics export")
+        long = keys.assign(
+            **{EXP_ATNAM: clean(export[EXP_ATNAM]).str.upper(), EXP_ATWRT: clean(export[EXP_ATWRT])}
+        )
+        long = long[long[EXP_ATNAM].isin(chars)]
+        if long.empty:
+            return keys.iloc[0:0].assign(**{c: pd.Series(dtype=object) for c in chars})
+        wide = long.pivot_table(
+            index=[EXP_MATNR, EXP_CHARG], columns=EXP_ATNAM, values=EXP_ATWRT, aggfunc="first"
+        ).reset_index()
+        wide.columns.name = None
+    else:
+        require_columns(export, set(chars), "Batch characteristics export")
+        wide = keys.assign(**{c: clean(export[c]) for c in chars}).drop_duplicates([EXP_MATNR, EXP_CHARG])
+
+    for c in chars:
+        if c not in wide.columns:
+            wide[c] = pd.NA
+    return wide
+
+
+def weight_mismatches(merged, rows, char, w_exp, tolerance, decimal_sep):
+    """Report parts for one numeric characteristic: UNPARSEABLE and VALUE_MISMATCH rows."""
+    raw = clean(merged[char])
+    w_act = to_number(merged[char], decimal_sep)
+    unparseable = rows & (w_exp.isna() | ((raw != "") & w_act.isna()))
+    differs = rows & ~unparseable & ~((w_exp - w_act).abs() <= tolerance)
+
+    parts = []
+    for mask, reason in ((unparseable, REASON_UNPARSEABLE), (differs, REASON_DIFF)):
+        bad = merged[mask]
+        parts.append(
+            bad.assign(
+                **{
+                    REP_FIELD: char,
+                    REP_EXPECTED: bad["_W_EXP"],
+                    REP_ACTUAL: clean(bad[char]),
+                    REP_REASON: reason,
+                }
+            )
+        )
+    return parts
+
+
+def check_scrap(
+    intended: pd.DataFrame,
+    export: pd.DataFrame,
+    weight_char: str = DEFAULT_WEIGHT_CHAR,
+    family_char: str = DEFAULT_FAMILY_CHAR,
+    tolerance: float = DEFAULT_TOLERANCE,
+    mln_weight_char: str = "",
+    decimal_sep: str = DECIMAL_AUTO,
+) -> pd.DataFrame:
+    weight_char, family_char = normalize_col(weight_char), normalize_col(family_char)
+    mln_weight_char = normalize_col(mln_weight_char) if mln_weight_char else ""
+    chars = [weight_char, family_char] + ([mln_weight_char] if mln_weight_char else [])
+    wide = pivot_characteristics(export, chars)
+
+    left = pd.DataFrame({
+        REP_ROW: intended[REP_ROW],
+        EXP_MATNR: normalize_key(intended[COL_MATERIAL]),
+        EXP_CHARG: clean(intended[COL_BATCH]).str.upper(),
+        "_W_EXP": intended[COL_WEIGHT],
+        "_F_EXP": clean(intended[COL_FAMILY]),
+        "_UOM": clean(intended.get(COL_BASE_UOM, pd.Series("", index=intended.index))).str.upper(),
+    })
+    merged = left.merge(wide, on=[EXP_MATNR, EXP_CHARG], how="left", indicator=True)
+    merged[REP_KEY] = merged[EXP_MATNR] + "/" + merged[EXP_CHARG]
+    found = merged["_merge"] == "both"
+
+    # Input weights follow the update script (comma or dot decimal); export uses --decimal-sep
+    w_exp = to_number(merged["_W_EXP"])
+    family_ok = clean(merged[family_char]).str.upper() == merged["_F_EXP"].str.upper()
+
+    # Assign from each subset's own columns so empty subsets stay empty
+    missing = merged[~found]
+    missing = missing.assign(
+        **{REP_FIELD: "", REP_EXPECTED: "", REP_ACTUAL: "", REP_REASON: REASON_MISSING}
+    )
+    family_bad = merged[found & ~family_ok]
+    family_bad = family_bad.assign(
+        **{
+            REP_FIELD: family_char,
+            REP_EXPECTED: family_bad["_F_EXP"],
+            REP_ACTUAL: clean(family_bad[family_char]),
+            REP_REASON: REASON_DIFF,
+        }
+    )
+    parts = [missing, family_bad]
+    parts += weight_mismatches(merged, found, weight_char, w_exp, tolerance, decimal_sep)
+
+    if mln_weight_char:
+        is_mln = found & (merged["_UOM"] == UOM_MLN)
+        parts += weight_mismatches(merged, is_mln, mln_weight_char, w_exp, tolerance, decimal_sep)
+
+    return pd.concat(parts, ignore_index=True)
+
+
+# ----------------------------
+# VERIFY: DISPATCH + OUTPUT
+# ----------------------------
+REQUIRED_INPUT = {
+    KIND_DESCRIPTION: [COL_SKU, COL_DESC],
+    KIND_STORAGE: [COL_SKU, COL_STORAGE_IN],
+    KIND_SCRAP: [COL_MATERIAL, COL_FAMILY, COL_BATCH, COL_WEIGHT],
+}
+OPTIONAL_INPUT = {
+    KIND_SCRAP: [COL_BASE_UOM],
+}
+
+
+def verify(kind: str, intended: pd.DataFrame, export: pd.DataFrame, **options) -> pd.DataFrame:
+    """Returns the mismatch report (empty when everything matches)."""
+    if kind == KIND_DESCRIPTION:
+        mismatches = check_description(intended, export, **options)
+    elif kind == KIND_STORAGE:
+        mismatches = check_storage(intended, export)
+    elif kind == KIND_SCRAP:
+        mismatches = check_scrap(intended, export, **options)
+    else:
+        raise ValueError(f"Unknown kind: {kind}. Expected one of {sorted(REQUIRED_INPUT)}")
+
+    report = mismatches[[REP_ROW, REP_KEY, REP_FIELD, REP_EXPECTED, REP_ACTUAL, REP_REASON]].fillna("")
+    return report.sort_values([REP_ROW, REP_FIELD]).reset_index(drop=True)
+
+
+def build_retry(intended: pd.DataFrame, report: pd.DataFrame, kind: str) -> pd.DataFrame:
+    """Failed input rows in the original column layout."""
+    failed = intended[intended[REP_ROW].isin(report[REP_ROW])]
+    columns = REQUIRED_INPUT[kind] + [c for c in OPTIONAL_INPUT.get(kind, []) if c in intended.columns]
+    return failed[columns].reset_index(drop=True)
+
+
+# ----------------------------
+# CLI / MAIN
+# ----------------------------
+def parse_args():
+    p = argparse.ArgumentParser(description="Verify a run by diffing a bulk SAP export (demo).")
+    p.add_argument("--kind", required=True, choices=sorted(REQUIRED_INPUT), help="Which update to verify.")
+    p.add_argument("--excel", default=os.getenv("SAP_AUTOMATION_EXCEL", ""), help="Input Excel used for the run.")
+    p.add_argument("--sheet", default=DEFAULT_SHEET_NAME, help="Sheet name or index (default: 0).")
+    p.add_argument("--export", required=True, help="Bulk export file (Excel/CSV/TXT) of the affected objects.")
+    p.add_argument("--report", default=DEFAULT_REPORT_PATH, help="Mismatch report output (.xlsx or .csv).")
+    p.add_argument("--retry", default="", help="Optional retry file with failed input rows (.xlsx).")
+    p.add_argument(
+        "--languages",
+        default="",
+        help="Comma-separated SPRAS values to check (description), e.g. E,S. Default: all exported.",
+    )
+    p.add_argument("--weight-char", default=DEFAULT_WEIGHT_CHAR, help="Weight characteristic name (scrap).")
+    p.add_argument("--family-char", default=DEFAULT_FAMILY_CHAR, help="Family characteristic name (scrap).")
+    p.add_argument(
+        "--mln-weight-char",
+        default="",
+        help="Second weight characteristic written for MLN materials (scrap; not checked if empty).",
+    )
+    p.add_argument(
+        "--decimal-sep",
+        default=DECIMAL_AUTO,
+        choices=DECIMAL_SEPARATORS,
+        help="Decimal separator of export numbers (scrap; default: auto = last of ',' and '.').",
+    )
+    p.add_argument("--master-export", default="", help="Master-data export to fill missing BASE_UOM (scrap).")
+    p.add_argument(
+        "--lookup-cache",
+        default=os.getenv("SAP_AUTOMATION_LOOKUP_CACHE", DEFAULT_CACHE_PATH),
+        help="Lookup cache written by batch_scrap_weight_review (scrap; used with --sap-system/--sap-client).",
+    )
+    p.add_argument("--sap-system", default="", help="SAP system ID of the run, selects the lookup cache file.")
+    p.add_argument("--sap-client", default="", help="SAP client of the run, selects the lookup cache file.")
+    p.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Numeric tolerance (scrap).")
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    if not args.excel:
+        raise SystemExit("Missing Excel path. Provide --excel <path> or set env var SAP_AUTOMATION_EXCEL.")
+    if args.retry and not args.retry.lower().endswith(".xlsx"):
+        raise SystemExit("Retry file must be .xlsx (the update scripts read their input with pd.read_excel).")
+
+    intended = load_intended(args.excel, args.sheet, REQUIRED_INPUT[args.kind])
+    export = read_table(args.export)
+
+    options = {}
+    if args.kind == KIND_DESCRIPTION:
+        options = {"languages": [x for x in args.languages.split(",") if x.strip()]}
+    if args.kind == KIND_SCRAP:
+        options = {
+            "weight_char": args.weight_char,
+            "family_char": args.family_char,
+            "tolerance": args.tolerance,
+            "mln_weight_char": args.mln_weight_char,
+            "decimal_sep": args.decimal_sep,
+        }
+
+    if args.kind == KIND_SCRAP and args.mln_weight_char:
+        scope = f"{args.sap_system}-{args.sap_client}" if args.sap_system and args.sap_client else ""
+        export_md = load_master_export(args.master_export) if args.master_export else None
+        lookup = MasterDataLookup(export=export_md, cache_path=args.lookup_cache, scope=scope)
+        intended = fill_base_uom(intended, lookup)
+        unverified = (intended[COL_BASE_UOM] == "").sum()
+        if unverified:
+            print(f"WARN: {unverified} row(s) without BASE_UOM; MLN weight ({args.mln_weight_char}) not verified")
+
+    report = verify(args.kind, intended, export, **options)
+    write_table(report, args.report)
+
+    failed_rows = intended[REP_ROW].isin(report[REP_ROW]).sum()
+    print(f"Checked {len(intended)} row(s): {len(intended) - failed_rows} OK, {failed_rows} mismatched")
+    print(f"Report: {args.report}")
+
+    retry = build_retry(intended, report, args.kind)
+    if args.retry and not retry.empty:
+        write_table(retry, args.retry)
+        print(f"Retry file: {args.retry}")
+
+
+if __name__ == "__main__":
+    main()